@@ -16,11 +16,19 @@ Copyright (c) 2023 by Kust-BME, All Rights Reserved.
 import pikepdf
 import os
 import argparse
+import hashlib
+import re
 import time
 import signal
+import stringprep
+import struct
 import sys
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from io import BytesIO
-from multiprocessing import Pool
+from multiprocessing import Pool, Event
+from threading import BoundedSemaphore
 
 # 尝试导入 pyhanko（用于提取 PDF hash）
 try:
@@ -30,19 +38,370 @@ try:
 except ImportError:
     PYHANKO_AVAILABLE = False
 
+# 尝试导入 cryptography（用 OpenSSL 的 RC4/AES 加速离线密码校验，可选）
+try:
+    try:
+        from cryptography.hazmat.decrepit.ciphers.algorithms import ARC4
+    except ImportError:
+        from cryptography.hazmat.primitives.ciphers.algorithms import ARC4
+    from cryptography.hazmat.primitives.ciphers import Cipher, modes
+    from cryptography.hazmat.primitives.ciphers.algorithms import AES
+    CRYPTOGRAPHY_AVAILABLE = True
+except ImportError:
+    CRYPTOGRAPHY_AVAILABLE = False
+
+# R<=4 的密码字符集限制：预编译正则，装载阶段批量预筛候选密码
+LATIN1_PASSWORD_PATTERN = re.compile(r'[\x00-\xff]*')
+
+# PDF标准安全处理程序的密码填充常量（ISO 32000-1 表3.3）
+PASSWORD_PADDING = bytes([
+    0x28, 0xBF, 0x4E, 0x5E, 0x4E, 0x75, 0x8A, 0x41,
+    0x64, 0x00, 0x4E, 0x56, 0xFF, 0xFA, 0x01, 0x08,
+    0x2E, 0x2E, 0x00, 0xB6, 0xD0, 0x68, 0x3E, 0x80,
+    0x2F, 0x0C, 0xA9, 0xFE, 0x64, 0x53, 0x69, 0x7A,
+])
+
+
+def rc4_crypt(key, data):
+    """
+    RC4加密/解密：优先走 OpenSSL（cryptography 库），
+    不可用时回退纯Python实现
+    """
+    if CRYPTOGRAPHY_AVAILABLE:
+        encryptor = Cipher(ARC4(key), mode=None).encryptor()
+        return encryptor.update(data) + encryptor.finalize()
+    S = list(range(256))
+    j = 0
+    key_len = len(key)
+    for i in range(256):
+        j = (j + S[i] + key[i % key_len]) % 256
+        S[i], S[j] = S[j], S[i]
+    out = bytearray(len(data))
+    i = j = 0
+    for k, byte in enumerate(data):
+        i = (i + 1) % 256
+        j = (j + S[i]) % 256
+        S[i], S[j] = S[j], S[i]
+        out[k] = byte ^ S[(S[i] + S[j]) % 256]
+    return bytes(out)
+
+
+class PdfPasswordChecker:
+    """
+    离线PDF密码校验器
+
+    只解析一次PDF的加密字典（/O、/U、/P、/ID、/R、/V、密钥长度），
+    之后按照PDF标准安全处理程序的算法直接用 hashlib 验证密码，
+    不再对每个候选密码执行完整的 pikepdf.open（重新解析交叉引用表、
+    构建QPDF上下文等），验证开销从毫秒级降到微秒级。
+
+    目前支持 R=2/3/4（RC4/AES128）、R=5（AES_R5_256）和 R=6（AES_256，
+    需要 cryptography 库提供 AES-CBC）的用户密码和所有者密码校验，
+    其余情况回退到 pikepdf 逐个验证。
+    """
+
+    def __init__(self, revision, version, key_length, permissions, document_id,
+                 odata, udata, oeseed=None, ueseed=None, encrypt_metadata=True):
+        self.revision = revision
+        self.version = version
+        self.key_length = key_length  # 密钥长度（bit）
+        self.permissions = permissions
+        self.document_id = document_id
+        self.odata = odata
+        self.udata = udata
+        self.oeseed = oeseed
+        self.ueseed = ueseed
+        self.encrypt_metadata = encrypt_metadata
+
+        # 预计算校验过程中与密码无关的部分，避免每个候选密码重复拼接/哈希
+        self._key_suffix = None
+        self._padding_id_digest = None
+        if self.revision in (2, 3, 4) and self.odata and self.udata:
+            suffix = (self.odata[:32] + struct.pack('<i', self.permissions)
+                      + self.document_id)
+            if self.revision >= 4 and not self.encrypt_metadata:
+                suffix += b'\xff\xff\xff\xff'
+            self._key_suffix = suffix
+            # 算法6中 MD5(填充常量 + 文档ID) 对所有候选密码都相同
+            self._padding_id_digest = hashlib.md5(
+                PASSWORD_PADDING + self.document_id).digest()
+
+        # 按加密版本一次性绑定校验实现，check() 不再逐个候选密码走分支
+        if self.revision in (2, 3, 4):
+            self._check_impl = self._check_rc4
+        elif self.revision == 5:
+            self._check_impl = self._check_r5
+        elif self.revision == 6 and CRYPTOGRAPHY_AVAILABLE:
+            self._check_impl = self._check_r6
+        else:
+            self._check_impl = None
+
+    @classmethod
+    def from_file(cls, pdf_file):
+        """
+        从PDF文件解析加密字典并构建校验器，失败时返回 None
+        （解析结果按 路径+修改时间+大小 缓存，同一文件只解析一次）
+        """
+        if not PYHANKO_AVAILABLE:
+            return None
+        try:
+            stat = os.stat(pdf_file)
+        except OSError:
+            return None
+        return cls._from_file_cached(pdf_file, stat.st_mtime_ns, stat.st_size)
+
+    @classmethod
+    @lru_cache(maxsize=16)
+    def _from_file_cached(cls, pdf_file, mtime_ns, size):
+        """
+        实际的加密字典解析，mtime_ns/size 仅用于缓存键（文件变化时失效）
+        """
+        try:
+            with open(pdf_file, "rb") as doc:
+                pdf = PdfFileReader(doc, strict=False)
+                encrypt_dict = pdf.encrypt_dict
+                if not encrypt_dict:
+                    return None
+                handler = pdf.security_handler
+                # pyhanko 返回的数值对象带有文件引用，转成普通 int 以便跨进程传递
+                return cls(
+                    revision=int(encrypt_dict["/R"]),
+                    version=int(encrypt_dict.get("/V", 0)),
+                    key_length=int(encrypt_dict.get("/Length", 40)),
+                    permissions=int(encrypt_dict["/P"]),
+                    document_id=bytes(pdf.document_id[0]),
+                    odata=bytes(handler.odata),
+                    udata=bytes(handler.udata),
+                    oeseed=bytes(handler.oeseed) if handler.oeseed else None,
+                    ueseed=bytes(handler.ueseed) if handler.ueseed else None,
+                    encrypt_metadata=bool(handler.encrypt_metadata),
+                )
+        except Exception:
+            return None
+
+    @property
+    def supported(self):
+        """
+        当前加密版本是否支持离线校验
+        """
+        if self.revision in (2, 3, 4):
+            return bool(self.odata and self.udata)
+        if self.revision in (5, 6):
+            # R=5/6 的 /O 和 /U 是 48 字节：32字节验证哈希 + 8字节验证盐 + 8字节密钥盐
+            # R=6 的迭代哈希还需要 AES-CBC（cryptography 库）
+            if self.revision == 6 and not CRYPTOGRAPHY_AVAILABLE:
+                return False
+            return bool(self.odata and self.udata
+                        and len(self.odata) >= 48 and len(self.udata) >= 48)
+        return False
+
+    def could_match(self, password):
+        """
+        判断候选密码在当前加密版本下是否可能匹配：
+        R<=4 的密码按 Latin-1 编码，超出该字符集的候选必然失配；
+        R>=5 的密码按 UTF-8 编码且规范上限127字节，超长的候选必然失配。
+        装载阶段即可丢弃，不必进入验证流程
+        """
+        if self.revision in (2, 3, 4):
+            return LATIN1_PASSWORD_PATTERN.fullmatch(password) is not None
+        if self.revision >= 5:
+            return len(password.encode('utf-8')) <= 127
+        return True
+
+    def normalize(self, password):
+        """
+        候选密码的有效形态：R<=4 取 Latin-1 编码的前32字节，
+        R>=5 取 UTF-8 编码的前127字节——算法只看有效形态，
+        形态相同的候选互为重复，只需验证其中一个
+        """
+        if self.revision in (2, 3, 4):
+            return password.encode('latin-1', 'ignore')[:32]
+        return self._prep_password_r5(password)
+
+    def check(self, password):
+        """
+        验证密码（用户密码或所有者密码），返回 bool
+        """
+        if self._check_impl is None:
+            return False
+        return self._check_impl(password)
+
+    def _check_rc4(self, password):
+        """
+        R=2/3/4 的密码校验入口（Latin-1 编码 + 填充）；
+        也接受已按 normalize() 预编码的 bytes，免去逐个候选重复编码
+        """
+        if isinstance(password, bytes):
+            pw_bytes = password
+        else:
+            try:
+                pw_bytes = password.encode('latin-1')
+            except UnicodeEncodeError:
+                # R<=4 的密码只能是 Latin-1 字符，无法编码的必然不匹配
+                return False
+        padded = (pw_bytes + PASSWORD_PADDING)[:32]
+        return self._check_user_rc4(padded) or self._check_owner_rc4(padded)
+
+    @staticmethod
+    def _prep_password_r5(password):
+        """
+        R>=5 的密码预处理：规范要求哈希前先做 SASLprep（RFC 4013）。
+        纯ASCII密码（字典里的绝大多数）直接编码零开销；
+        含非ASCII字符时做映射（非ASCII空白→空格、软连字符等移除）
+        加 NFKC 规范化，再按 UTF-8 编码截断到127字节
+        """
+        if password.isascii():
+            return password.encode('ascii')[:127]
+        chars = []
+        for ch in password:
+            if stringprep.in_table_c12(ch):
+                # 非ASCII空白字符映射为普通空格
+                chars.append(' ')
+            elif stringprep.in_table_b1(ch):
+                # "映射为空"的字符（软连字符、零宽连接符等）直接移除
+                continue
+            else:
+                chars.append(ch)
+        normalized = unicodedata.normalize('NFKC', ''.join(chars))
+        return normalized.encode('utf-8')[:127]
+
+    def _check_r5(self, password):
+        """
+        R=5 的密码校验入口（SASLprep + UTF-8 编码并截断到 127 字节）
+        """
+        pw_bytes = self._prep_password_r5(password)
+        return self._check_user_r5(pw_bytes) or self._check_owner_r5(pw_bytes)
+
+    def _compute_key_rc4(self, padded_password):
+        """
+        算法2：由填充后的密码计算加密密钥（R=2/3/4）
+        """
+        key = hashlib.md5(padded_password + self._key_suffix).digest()
+        n = 5 if self.revision == 2 else max(5, self.key_length // 8)
+        if self.revision >= 3:
+            for _ in range(50):
+                key = hashlib.md5(key[:n]).digest()
+        return key[:n]
+
+    def _check_user_rc4(self, padded_password):
+        """
+        算法6：验证用户密码（R=2/3/4）
+        """
+        key = self._compute_key_rc4(padded_password)
+        if self.revision == 2:
+            return rc4_crypt(key, PASSWORD_PADDING) == self.udata[:32]
+        # R>=3：MD5(填充常量 + 文档ID)（已预计算），再用 key XOR i 迭代RC4加密20次
+        out = rc4_crypt(key, self._padding_id_digest)
+        for i in range(1, 20):
+            out = rc4_crypt(bytes(b ^ i for b in key), out)
+        return out == self.udata[:16]
+
+    def _check_owner_rc4(self, padded_password):
+        """
+        算法7：验证所有者密码（R=2/3/4），解密 /O 得到用户密码后复用算法6
+        """
+        key = hashlib.md5(padded_password).digest()
+        n = 5 if self.revision == 2 else max(5, self.key_length // 8)
+        if self.revision >= 3:
+            for _ in range(50):
+                key = hashlib.md5(key[:n]).digest()
+        key = key[:n]
+        if self.revision == 2:
+            user_padded = rc4_crypt(key, self.odata[:32])
+        else:
+            user_padded = self.odata[:32]
+            for i in range(19, -1, -1):
+                user_padded = rc4_crypt(bytes(b ^ i for b in key), user_padded)
+        return self._check_user_rc4(user_padded)
+
+    def _check_user_r5(self, pw_bytes):
+        """
+        验证用户密码（R=5）：SHA-256(密码 + 验证盐) 与 /U 的前32字节比较
+        """
+        validation_salt = self.udata[32:40]
+        return hashlib.sha256(pw_bytes + validation_salt).digest() == self.udata[:32]
+
+    def _check_owner_r5(self, pw_bytes):
+        """
+        验证所有者密码（R=5）：SHA-256(密码 + 验证盐 + /U前48字节) 与 /O 的前32字节比较
+        """
+        validation_salt = self.odata[32:40]
+        return (hashlib.sha256(pw_bytes + validation_salt + self.udata[:48]).digest()
+                == self.odata[:32])
+
+    def _check_r6(self, password):
+        """
+        R=6 的密码校验入口（SASLprep + UTF-8 编码并截断到 127 字节）
+        """
+        pw_bytes = self._prep_password_r5(password)
+        return self._check_user_r6(pw_bytes) or self._check_owner_r6(pw_bytes)
+
+    @staticmethod
+    def _hash_r6(pw_bytes, salt, udata=b''):
+        """
+        ISO 32000-2 算法2.B：R=6 的迭代哈希
+        （SHA-256/384/512 轮换 + AES-128-CBC，至少64轮）
+        """
+        k = hashlib.sha256(pw_bytes + salt + udata).digest()
+        round_num = 0
+        while True:
+            k1 = (pw_bytes + k + udata) * 64
+            encryptor = Cipher(AES(k[:16]), modes.CBC(k[16:32])).encryptor()
+            e = encryptor.update(k1) + encryptor.finalize()
+            # 取 E 前16字节之和 mod 3 选择下一轮哈希算法
+            remainder = sum(e[:16]) % 3
+            if remainder == 0:
+                k = hashlib.sha256(e).digest()
+            elif remainder == 1:
+                k = hashlib.sha384(e).digest()
+            else:
+                k = hashlib.sha512(e).digest()
+            round_num += 1
+            if round_num >= 64 and e[-1] <= round_num - 32:
+                return k[:32]
+
+    def _check_user_r6(self, pw_bytes):
+        """
+        验证用户密码（R=6）：算法2.B(密码, 验证盐) 与 /U 的前32字节比较
+        """
+        validation_salt = self.udata[32:40]
+        return self._hash_r6(pw_bytes, validation_salt) == self.udata[:32]
+
+    def _check_owner_r6(self, pw_bytes):
+        """
+        验证所有者密码（R=6）：算法2.B(密码, 验证盐, /U前48字节) 与 /O 的前32字节比较
+        """
+        validation_salt = self.odata[32:40]
+        return (self._hash_r6(pw_bytes, validation_salt, self.udata[:48])
+                == self.odata[:32])
+
+
 def verify_password_in_memory(pdf_data, password):
     """
     在内存中验证PDF密码，避免磁盘I/O
-    
+
     参数:
-        pdf_data: PDF文件的二进制数据
+        pdf_data: PDF文件的二进制数据、可复用的 BytesIO，或PDF文件路径
+                  （路径通过 pikepdf 的 mmap 模式零拷贝打开；
+                  循环里反复验证时传同一个 BytesIO 可免去每次重新包装）
         password: 要验证的密码
-        
+
     返回:
         bool: 密码是否正确
     """
     try:
-        pdf = pikepdf.open(BytesIO(pdf_data), password=password)
+        # 仅做验证：关闭警告与损坏恢复，避免在错误密码上浪费解析工作
+        if isinstance(pdf_data, BytesIO):
+            pdf_data.seek(0)
+            pdf = pikepdf.open(pdf_data, password=password,
+                               suppress_warnings=True, attempt_recovery=False)
+        elif isinstance(pdf_data, (bytes, bytearray)):
+            pdf = pikepdf.open(BytesIO(pdf_data), password=password,
+                               suppress_warnings=True, attempt_recovery=False)
+        else:
+            pdf = pikepdf.open(pdf_data, password=password,
+                               access_mode=pikepdf.AccessMode.mmap,
+                               suppress_warnings=True, attempt_recovery=False)
         pdf.close()
         return True
     except (pikepdf.PasswordError, pikepdf.PdfError):
@@ -52,40 +411,74 @@ def verify_password_in_memory(pdf_data, password):
         return False
 
 
-def verify_password_batch(pdf_data, password_batch):
+def verify_password_batch(pdf_data, password_batch, checker=None, stop_event=None):
     """
     批量验证密码，返回第一个成功的密码
-    
+
     参数:
         pdf_data: PDF文件的二进制数据
         password_batch: 密码批次（列表）
-        
+        checker: PdfPasswordChecker 实例（可选，用于离线快速校验）
+        stop_event: 共享停止事件（可选，其他进程找到密码后尽快放弃本批次）
+
     返回:
         str or None: 第一个成功的密码，如果没有则返回None
     """
+    if checker is not None:
+        # 快速路径：离线哈希校验，命中后再用 pikepdf 确认一次
+        # 每32个密码轮询一次停止事件，摊薄跨进程同步的开销
+        for i, password in enumerate(password_batch):
+            if stop_event is not None and i % 32 == 0 and stop_event.is_set():
+                return None
+            if checker.check(password) and verify_password_in_memory(pdf_data, password):
+                return password
+        return None
     for password in password_batch:
+        # pikepdf.open 本身是毫秒级开销，每个密码轮询一次也无妨
+        if stop_event is not None and stop_event.is_set():
+            return None
         if verify_password_in_memory(pdf_data, password):
             return password
     return None
 
 
-def verify_password_worker(args):
+# 工作进程的全局状态（由 init_verify_worker 设置一次，
+# 避免每个批次重复 pickle 整个 PDF 数据和校验器）
+_worker_pdf_data = None
+_worker_checker = None
+_worker_stop_event = None
+
+
+def init_verify_worker(pdf_source, checker, stop_event=None):
     """
-    工作进程函数：验证一批密码
-    
+    工作进程初始化：保存共享数据并忽略 KeyboardInterrupt
+
     参数:
-        args: (pdf_data, password_batch) 元组
-        
-    返回:
-        str or None: 找到的密码，如果没有则返回None
+        pdf_source: PDF文件路径（工作进程内通过 mmap 打开）或二进制数据
+        checker: PdfPasswordChecker 实例或 None
+        stop_event: 共享停止事件或 None
     """
+    global _worker_pdf_data, _worker_checker, _worker_stop_event
+    _worker_pdf_data = pdf_source
+    _worker_checker = checker
+    _worker_stop_event = stop_event
     # 在子进程中忽略 KeyboardInterrupt，避免输出 Traceback
-    import signal
     signal.signal(signal.SIGINT, signal.SIG_IGN)
-    
+
+
+def verify_password_worker(password_batch):
+    """
+    工作进程函数：验证一批密码（PDF数据和校验器来自进程全局状态）
+
+    参数:
+        password_batch: 密码批次（列表）
+
+    返回:
+        str or None: 找到的密码，如果没有则返回None
+    """
     try:
-        pdf_data, password_batch = args
-        return verify_password_batch(pdf_data, password_batch)
+        return verify_password_batch(_worker_pdf_data, password_batch,
+                                     _worker_checker, _worker_stop_event)
     except KeyboardInterrupt:
         # 子进程中的中断，静默处理
         return None
@@ -94,100 +487,289 @@ def verify_password_worker(args):
         return None
 
 
-def load_passwords_from_dict(dictionary_folder):
+# 现实中命中率最高的一批密码：在读取磁盘字典之前先行尝试，
+# 命中时可以完全跳过字典加载、去重和排序
+COMMON_PASSWORDS = [
+    '123456', 'password', '123456789', '12345678', '12345', '111111',
+    '1234567', '123123', 'qwerty', 'abc123', '000000', '1234567890',
+    'admin', '666666', '888888', 'password1', '123321',
+]
+
+
+def iter_fast_candidates(include_pins=False):
+    """
+    生成快速路径候选密码：内置常见密码、常见年份，
+    以及（可选的）全部4位数字PIN
+
+    参数:
+        include_pins: 是否枚举 0000-9999
+
+    生成:
+        str: 候选密码
+    """
+    yield from COMMON_PASSWORDS
+    for year in range(1900, 2031):
+        yield str(year)
+    if include_pins:
+        for i in range(10000):
+            yield f"{i:04d}"
+
+
+def try_common_passwords(input_file, checker=None):
+    """
+    同步尝试内置的常见密码、年份和数字PIN（不读取字典文件夹）
+
+    参数:
+        input_file: PDF文件路径
+        checker: PdfPasswordChecker 实例（可选）
+
+    返回:
+        str or None: 命中的密码，没有则返回None
+    """
+    use_checker = checker is not None and checker.supported
+    # 只有离线校验可用时才枚举1万个PIN——逐个 pikepdf.open 跑这一遍太慢
+    for password in iter_fast_candidates(include_pins=use_checker):
+        if use_checker:
+            if checker.check(password) and verify_password_in_memory(input_file, password):
+                return password
+        elif verify_password_in_memory(input_file, password):
+            return password
+    return None
+
+
+def iter_dictionary_files(dictionary_folder):
+    """
+    用 os.scandir 递归遍历字典文件夹，产出所有 .txt 文件路径
+    （DirEntry 自带缓存的 stat 结果，比 os.walk 少一次列表物化和重复 stat）
+
+    参数:
+        dictionary_folder: 字典文件夹路径
+
+    生成:
+        str: 字典文件路径
+    """
+    try:
+        entries = os.scandir(dictionary_folder)
+    except OSError as e:
+        print(f"⚠️ 读取字典目录失败 {dictionary_folder}: {e}")
+        return
+    with entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from iter_dictionary_files(entry.path)
+            elif entry.is_file() and entry.name.endswith('.txt'):
+                yield entry.path
+
+
+def iter_file_passwords(file_path):
+    """
+    逐行产出单个字典文件中的非空密码
+
+    参数:
+        file_path: 字典文件路径
+
+    生成:
+        str: 密码
+    """
+    try:
+        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+            for line in f:
+                password = line.strip()
+                if password:  # 忽略空行
+                    yield password
+    except Exception as e:
+        print(f"⚠️ 读取字典文件失败 {file_path}: {e}")
+
+
+def iter_dictionary_passwords(dictionary_folder):
+    """
+    流式遍历字典文件夹下的所有 .txt 文件，逐行产出非空密码
+    （逐行生成，不把整个文件读入内存）
+
+    参数:
+        dictionary_folder: 字典文件夹路径
+
+    生成:
+        str: 密码
+    """
+    for file_path in iter_dictionary_files(dictionary_folder):
+        yield from iter_file_passwords(file_path)
+
+
+def read_dictionary_file(file_path):
+    """
+    一次性读入单个字典文件的非空密码（供并行加载使用）
+
+    整个文件按二进制读入后只解码一次，再用 splitlines 切分，
+    避免文本模式逐行解码的开销（百万行级字典下差距明显）
+    """
+    try:
+        with open(file_path, 'rb') as f:
+            text = f.read().decode('utf-8', errors='ignore')
+    except Exception as e:
+        print(f"⚠️ 读取字典文件失败 {file_path}: {e}")
+        return []
+    return [password for password in map(str.strip, text.splitlines()) if password]
+
+
+def load_password_frequencies(frequency_file):
+    """
+    解析词频文件（rockyou-withcount 风格，每行"次数 密码"），
+    返回 密码->次数 的字典，解析失败时返回空字典
+    """
+    frequencies = {}
+    try:
+        with open(frequency_file, 'rb') as f:
+            text = f.read().decode('utf-8', errors='ignore')
+    except Exception as e:
+        print(f"⚠️ 读取词频文件失败 {frequency_file}: {e}")
+        return frequencies
+    for line in text.splitlines():
+        parts = line.split(None, 1)
+        if len(parts) == 2 and parts[0].isdigit():
+            frequencies[parts[1].strip()] = int(parts[0])
+    return frequencies
+
+
+def load_passwords_from_dict(dictionary_folder, exclude=None, frequency_file=None):
     """
     从字典文件夹加载所有密码，并进行优化处理
-    
+
     参数:
         dictionary_folder: 字典文件夹路径
-        
+        exclude: 已经尝试过、无需再试的密码集合（可选）
+        frequency_file: 词频文件路径（可选，每行"次数 密码"），
+                        提供时按使用频率从高到低排序，而不是按长度
+
     返回:
         list: 优化后的密码列表（去重、排序）
     """
-    all_passwords = []
-    
-    # 收集所有密码
-    for root, _, files in os.walk(dictionary_folder):
-        for file in files:
-            if file.endswith('.txt'):
-                file_path = os.path.join(root, file)
-                try:
-                    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                        for line in f:
-                            password = line.strip()
-                            if password:  # 忽略空行
-                                all_passwords.append(password)
-                except Exception as e:
-                    print(f"⚠️ 读取字典文件失败 {file_path}: {e}")
-                    continue
-    
-    if not all_passwords:
+    # 并行读取各字典文件（I/O密集，线程足够），按文件顺序合并保证确定性；
+    # 去重依旧流式进行：边合并边丢重复项
+    file_paths = list(iter_dictionary_files(dictionary_folder))
+    seen = set()
+    unique_passwords = []
+    total_count = 0
+    if file_paths:
+        with ThreadPoolExecutor(max_workers=min(4, len(file_paths))) as io_pool:
+            for file_passwords in io_pool.map(read_dictionary_file, file_paths):
+                total_count += len(file_passwords)
+                for password in file_passwords:
+                    if password not in seen:
+                        seen.add(password)
+                        unique_passwords.append(password)
+
+    if not unique_passwords:
         return []
-    
-    # 去重（保持顺序）
-    unique_passwords = list(dict.fromkeys(all_passwords))
-    
-    # 优化排序：短密码优先，然后按字典序
-    sorted_passwords = sorted(unique_passwords, key=lambda x: (len(x), x))
-    
-    print(f"📚 加载密码字典：原始 {len(all_passwords)} 个，去重后 {len(unique_passwords)} 个")
-    
-    return sorted_passwords
 
+    unique_count = len(unique_passwords)
 
-def crack_pdf_password_optimized(input_file, dictionary_folder, num_processes=8, batch_size=50):
+    # 剔除快速路径已经试过的密码（集合成员判断，O(1)每个）
+    if exclude:
+        unique_passwords = [p for p in unique_passwords if p not in exclude]
+
+    # 优化排序：有词频时按使用频率从高到低（常用密码先试，期望尝试次数最少）
+    frequencies = load_password_frequencies(frequency_file) if frequency_file else None
+    if frequencies:
+        unique_passwords.sort(key=lambda x: (-frequencies.get(x, 0), len(x), x))
+    else:
+        # 短密码优先：按长度分桶后依序输出，免去全局 O(n log n) 的字符串比较；
+        # 同长度内保持字典文件里的原始顺序（字典通常已按常用度编排）
+        buckets = {}
+        for password in unique_passwords:
+            buckets.setdefault(len(password), []).append(password)
+        unique_passwords = [password
+                            for length in sorted(buckets)
+                            for password in buckets[length]]
+
+    print(f"📚 加载密码字典：原始 {total_count} 个，去重后 {unique_count} 个")
+
+    return unique_passwords
+
+
+def available_cpu_count():
+    """
+    返回当前进程实际可用的CPU核数
+    （优先使用 CPU 亲和性掩码，容器/cgroup 限核时比 cpu_count 准确）
+    """
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def crack_pdf_password_optimized(input_file, dictionary_folder, num_processes=None, batch_size=None, exclude=None, frequency_file=None):
     """
     高性能PDF密码破解（多进程版本）
-    
+
     参数:
         input_file: PDF文件路径
         dictionary_folder: 密码字典文件夹路径
-        num_processes: 进程数（默认8）
-        batch_size: 每个进程处理的密码批次大小（默认50）
-        
+        num_processes: 进程数（默认取可用CPU核数）
+        batch_size: 每个进程处理的密码批次大小（默认按字典规模自适应）
+        exclude: 已经尝试过、无需再试的密码集合（可选）
+        frequency_file: 词频文件路径（可选），提供时按使用频率排序
+
     返回:
         str: 找到的密码
         None: 未找到密码或用户中断
     """
     start_time = time.time()
-    
-    # 1. 预加载PDF到内存
-    print("📥 预加载PDF文件到内存...")
+
+    # 进程数默认等于可用核数；超配只会加剧缓存争用，不会更快
+    cores = available_cpu_count()
+    if num_processes is None:
+        num_processes = cores
+    elif num_processes > cores:
+        print(f"⚠️ 进程数 {num_processes} 超过可用CPU核数 {cores}，性能可能不升反降")
+
+    # 1. 检查PDF文件（不再整份读入内存：工作进程各自 mmap，
+    #    物理页由操作系统页缓存共享，避免每个进程一份拷贝）
+    print("📥 检查PDF文件...")
     try:
         with open(input_file, 'rb') as f:
-            pdf_data = f.read()
-        print(f"✅ PDF文件已加载到内存 ({len(pdf_data) / 1024:.2f} KB)")
+            header = f.read(1024)
+        pdf_size = os.path.getsize(input_file)
     except Exception as e:
-        print(f"❌ 加载PDF文件失败: {e}")
+        print(f"❌ 读取PDF文件失败: {e}")
         return None
-    
-    # 2. 加载并优化密码列表
-    print("📚 加载密码字典...")
-    passwords = load_passwords_from_dict(dictionary_folder)
-    
-    if not passwords:
-        print("❌ 字典中没有找到有效密码")
+    # 进入破解流程前先确认这确实是一个需要破解的PDF，
+    # 配置错误时微秒级失败，而不是白跑一轮多进程字典攻击
+    if b'%PDF' not in header:
+        print("❌ 不是有效的PDF文件（缺少 %PDF 文件头）")
         return None
-    
-    print(f"🚀 开始破解，使用 {num_processes} 个进程，批次大小 {batch_size}")
-    
-    # 3. 将密码列表分批
-    password_batches = []
-    for i in range(0, len(passwords), batch_size):
-        batch = passwords[i:i + batch_size]
-        password_batches.append((pdf_data, batch))
-    
-    print(f"📦 共分为 {len(password_batches)} 个批次")
-    
+    if verify_password_in_memory(input_file, ''):
+        print("✅ PDF未加密（或用户密码为空），无需字典破解")
+        return ''
+    print(f"✅ PDF文件可读 ({pdf_size / 1024:.2f} KB)")
+
+
+    # 2. 后台线程加载密码字典（I/O密集），与进程池启动重叠进行
+    print("📚 加载密码字典...")
+    dict_loader = ThreadPoolExecutor(max_workers=1)
+    passwords_future = dict_loader.submit(load_passwords_from_dict, dictionary_folder,
+                                          exclude, frequency_file)
+
+    # 3. 解析加密字典，尽可能使用离线哈希校验
+    checker = PdfPasswordChecker.from_file(input_file)
+    if checker is not None and checker.supported:
+        print(f"⚡ 使用离线哈希校验（R={checker.revision}），跳过逐个 pikepdf.open")
+    else:
+        checker = None
+        print("🐢 加密版本暂不支持离线校验，回退 pikepdf 逐个验证")
+
     # 4. 多进程并行验证
     found_password = None
     completed_batches = 0
     last_progress_time = start_time
     pool = None
-    
+    passwords = []
+    # 共享停止事件：任一进程命中后，其余进程尽快放弃手头的批次
+    stop_event = Event()
+
     # 设置信号处理，快速终止子进程
     def signal_handler(sig, frame):
         # 立即终止进程池，减少子进程的错误输出
+        stop_event.set()
         if pool is not None:
             try:
                 pool.terminate()
@@ -195,22 +777,121 @@ def crack_pdf_password_optimized(input_file, dictionary_folder, num_processes=8,
             except:
                 pass
         raise KeyboardInterrupt
-    
+
     original_handler = signal.signal(signal.SIGINT, signal_handler)
-    
+
     try:
-        pool = Pool(num_processes)
+        # 先启动进程池：fork + 子进程初始化与字典加载并行，省下二者中较短的耗时
+        pool = Pool(num_processes, initializer=init_verify_worker,
+                    initargs=(input_file, checker, stop_event))
+
+        passwords = passwords_future.result()
+        dict_loader.shutdown()
+        if not passwords:
+            print("❌ 字典中没有找到有效密码")
+            return None
+
+        # 过滤当前加密版本下注定失配的候选密码（如 R<=4 下无法 Latin-1 编码的），
+        # 并按有效形态去重：截断后相同的候选只保留第一个。
+        # R<=4 时直接分发预编码的 bytes 形态（Latin-1 可无损还原），
+        # 工作进程不再对每个候选重复编码，命中后解码回 str
+        predecode = checker is not None and checker.revision <= 4
+        if checker is not None:
+            before_filter = len(passwords)
+            seen_forms = set()
+            kept = []
+            for candidate in passwords:
+                if not checker.could_match(candidate):
+                    continue
+                form = checker.normalize(candidate)
+                if form in seen_forms:
+                    continue
+                seen_forms.add(form)
+                kept.append(form if predecode else candidate)
+            passwords = kept
+            dropped = before_filter - len(passwords)
+            if dropped:
+                print(f"🧹 过滤掉 {dropped} 个编码不符或截断后重复的候选密码")
+            if not passwords:
+                print("❌ 过滤后没有剩余候选密码")
+                return None
+
+        # 批次大小默认自动调优（hashcat autotune 思路）：实测前一小段候选的
+        # 单次校验耗时，让每个批次约跑0.2秒——批次太小则进程间通信开销占比高，
+        # 太大则尾部负载不均、命中后白做的验证多
+        if batch_size is None:
+            sample = passwords[:256] if checker is not None else passwords[:8]
+            probe_start = time.time()
+            for candidate in sample:
+                if checker is not None:
+                    hit = checker.check(candidate) and \
+                        verify_password_in_memory(input_file, candidate)
+                else:
+                    hit = verify_password_in_memory(input_file, candidate)
+                if hit:
+                    # 调优采样阶段就撞上了密码，直接返回
+                    if isinstance(candidate, bytes):
+                        candidate = candidate.decode('latin-1')
+                    elapsed_time = time.time() - start_time
+                    print(f"\n✅ 找到密码：{candidate}")
+                    print(f"📊 耗时：{elapsed_time:.2f}秒")
+                    return candidate
+            probe_elapsed = time.time() - probe_start
+            per_guess = probe_elapsed / len(sample) if sample else 0
+            if per_guess > 0:
+                batch_size = max(16, min(5000, int(0.2 / per_guess)))
+            else:
+                batch_size = 50
+            print(f"🧪 自动调优：单次校验约 {per_guess * 1e6:.0f} 微秒，批次大小 {batch_size}")
+
+        # 小字典时压低批次大小，保证每个进程至少能分到约4个批次：
+        # 批次数接近进程数时，最后一批跑完前其余进程只能空转（尾部负载不均）
+        batch_cap = max(1, len(passwords) // (num_processes * 4))
+        if batch_size > batch_cap:
+            batch_size = batch_cap
+            print(f"📐 字典较小，批次大小调整为 {batch_size}")
+
+        print(f"🚀 开始破解，使用 {num_processes} 个进程，批次大小 {batch_size}")
+
+        # 5. 将密码列表分批（PDF路径和校验器经由 initializer 传递，批次里只有密码；
+        #    批次惰性生成，不再物化一份完整的批次列表）
+        total_batches = (len(passwords) + batch_size - 1) // batch_size
+        password_batches = (passwords[i:i + batch_size]
+                            for i in range(0, len(passwords), batch_size))
+
+        print(f"📦 共分为 {total_batches} 个批次")
+
+        # imap_unordered 的发送线程会贪婪地把整个生成器灌进任务队列，
+        # 用信号量做背压：在途批次不超过进程数的4倍，每收到一个结果再放行一个
+        feed_sem = BoundedSemaphore(num_processes * 4)
+
+        def bounded_batches():
+            for batch in password_batches:
+                # 带超时轮询，命中/中断后发送线程能及时退出，避免 terminate 时卡死
+                while not feed_sem.acquire(timeout=0.1):
+                    if stop_event.is_set():
+                        return
+                yield batch
+
         # 使用imap_unordered以获得更好的性能（不保证顺序）
-        results = pool.imap_unordered(verify_password_worker, password_batches)
-        
+        results = pool.imap_unordered(verify_password_worker, bounded_batches())
+
         # 处理结果，找到密码后立即返回
         try:
             for result in results:
+                try:
+                    feed_sem.release()
+                except ValueError:
+                    pass
                 completed_batches += 1
                 tried_count = min(completed_batches * batch_size, len(passwords))
                 
                 if result is not None:
+                    if isinstance(result, bytes):
+                        result = result.decode('latin-1')
                     found_password = result
+                    # 通知其他进程立即停止，再终止进程池
+                    stop_event.set()
                     elapsed_time = time.time() - start_time
                     speed = tried_count / elapsed_time if elapsed_time > 0 else 0
                     print(f"\n✅ 找到密码：{found_password}")
@@ -222,16 +903,18 @@ def crack_pdf_password_optimized(input_file, dictionary_folder, num_processes=8,
                     pool.join()
                     return found_password
                 
-                # 每1秒或每100个批次输出一次进度
+                # 最多每秒输出一次进度：print 走TTY要格式化+刷新，
+                # 批次完成很快时按批次打印会成为主循环的固定开销
                 current_time = time.time()
-                if current_time - last_progress_time >= 1.0 or completed_batches % 100 == 0:
+                if current_time - last_progress_time >= 1.0:
                     elapsed_time = current_time - start_time
                     speed = tried_count / elapsed_time if elapsed_time > 0 else 0
                     progress_pct = (tried_count / len(passwords) * 100) if len(passwords) > 0 else 0
                     print(f"⏳ 进度: {tried_count}/{len(passwords)} ({progress_pct:.1f}%), 速度: {speed:.2f} 密码/秒", end='\r')
                     last_progress_time = current_time
         except KeyboardInterrupt:
-            # 立即终止进程池，减少子进程的错误输出
+            # 先置位停止事件，再终止进程池，减少子进程的错误输出
+            stop_event.set()
             if pool is not None:
                 try:
                     pool.terminate()
@@ -242,7 +925,7 @@ def crack_pdf_password_optimized(input_file, dictionary_folder, num_processes=8,
     
     except KeyboardInterrupt:
         elapsed_time = time.time() - start_time
-        tried_count = completed_batches * batch_size
+        tried_count = completed_batches * (batch_size or 0)
         speed = tried_count / elapsed_time if elapsed_time > 0 else 0
         print(f"\n\n⚠️ 用户中断（Ctrl+C）")
         print(f"📊 已尝试: {tried_count} 个密码")
@@ -251,6 +934,7 @@ def crack_pdf_password_optimized(input_file, dictionary_folder, num_processes=8,
             progress_pct = (tried_count / len(passwords) * 100)
             print(f"📉 进度: {tried_count}/{len(passwords)} ({progress_pct:.1f}%)")
         # 确保进程池被终止
+        stop_event.set()
         if pool is not None:
             try:
                 pool.terminate()
@@ -263,6 +947,7 @@ def crack_pdf_password_optimized(input_file, dictionary_folder, num_processes=8,
         raise KeyboardInterrupt("用户中断破解过程")
     except Exception as e:
         print(f"\n❌ 破解过程出错: {e}")
+        stop_event.set()
         if pool is not None:
             try:
                 pool.terminate()
@@ -279,7 +964,7 @@ def crack_pdf_password_optimized(input_file, dictionary_folder, num_processes=8,
             except:
                 pass
     
-    # 5. 如果没找到密码
+    # 6. 如果没找到密码
     elapsed_time = time.time() - start_time
     speed = len(passwords) / elapsed_time if elapsed_time > 0 else 0
     print(f"\n❌ 未找到有效密码")
@@ -289,56 +974,86 @@ def crack_pdf_password_optimized(input_file, dictionary_folder, num_processes=8,
     return None
 
 
-def crack_pdf_password(input_file, dictionary_folder):
+def crack_pdf_password(input_file, dictionary_folder, exclude=None, frequency_file=None):
     """
     最终性能版密码破解：移除所有不必要的开销
+
+    参数:
+        input_file: PDF文件路径
+        dictionary_folder: 密码字典文件夹路径
+        exclude: 已经尝试过、无需再试的密码集合（可选）
+        frequency_file: 词频文件路径（可选），提供时按使用频率排序
     """
     start_time = time.time()
-    
-    # 收集所有密码（最简洁的方式）
-    all_passwords = []
-    for root, _, files in os.walk(dictionary_folder):
-        for file in files:
-            if file.endswith('.txt'):
-                with open(os.path.join(root, file), 'r', encoding='utf-8', errors='ignore') as f:
-                    all_passwords.extend(p.strip() for p in f if p.strip())
-    
+
+    # 预读PDF到内存，循环中不再对每个候选密码重复磁盘I/O；
+    # 包装成单个可复用的 BytesIO，验证时 seek(0) 即可，不必每次重新包装
+    with open(input_file, 'rb') as f:
+        raw_data = f.read()
+    if b'%PDF' not in raw_data[:1024]:
+        print("❌ 不是有效的PDF文件（缺少 %PDF 文件头）")
+        return None
+    pdf_data = BytesIO(raw_data)
+
+    # 流式收集所有密码（与优化版本共用同一个生成器）
+    all_passwords = list(iter_dictionary_passwords(dictionary_folder))
+
     if not all_passwords:
         print("字典中没有找到有效密码")
         return None
     
-    print(f"总共找到 {len(all_passwords)} 个密码")
-    
-    # 极简优先级排序：仅按长度排序
-    sorted_passwords = sorted(all_passwords, key=len)
-    
+    # 去重（保持顺序）——多个字典文件之间往往大量重叠
+    all_passwords = list(dict.fromkeys(all_passwords))
+
+    # 剔除已经试过的密码
+    if exclude:
+        all_passwords = [p for p in all_passwords if p not in exclude]
+
+    print(f"总共找到 {len(all_passwords)} 个密码（去重后）")
+
+    # 极简优先级排序：有词频时按使用频率从高到低，否则仅按长度排序
+    frequencies = load_password_frequencies(frequency_file) if frequency_file else None
+    if frequencies:
+        sorted_passwords = sorted(all_passwords,
+                                  key=lambda x: (-frequencies.get(x, 0), len(x)))
+    else:
+        sorted_passwords = sorted(all_passwords, key=len)
+
+    # 尽可能使用离线哈希校验，避免逐个 pikepdf.open
+    checker = PdfPasswordChecker.from_file(input_file)
+    if checker is not None and not checker.supported:
+        checker = None
+
     # 直接顺序尝试（最简洁最高效）
     tried_count = 0
     last_progress_time = start_time
-    
+
     try:
         for password in sorted_passwords:
-            try:
-                with pikepdf.open(input_file, password=password) as pdf:
-                    elapsed_time = time.time() - start_time
-                    speed = (tried_count + 1) / elapsed_time
-                    print(f"\n✅ 找到密码：{password}")
-                    print(f"📊 性能：{speed:.2f} 密码/秒 (耗时：{elapsed_time:.2f}秒)")
-                    print(f"📈 尝试了 {tried_count + 1} 个密码")
-                    return password
-            except (pikepdf.PasswordError, pikepdf.PdfError):
-                tried_count += 1
-                
-                # 每1秒或每100个密码输出一次进度
-                current_time = time.time()
-                if current_time - last_progress_time >= 1.0 or tried_count % 100 == 0:
-                    elapsed_time = current_time - start_time
-                    speed = tried_count / elapsed_time if elapsed_time > 0 else 0
-                    progress_pct = (tried_count / len(sorted_passwords) * 100) if len(sorted_passwords) > 0 else 0
-                    print(f"⏳ 进度: {tried_count}/{len(sorted_passwords)} ({progress_pct:.1f}%), 速度: {speed:.2f} 密码/秒", end='\r')
-                    last_progress_time = current_time
-                
-                continue
+            if checker is not None:
+                # 离线校验命中后再用 pikepdf 确认一次
+                hit = checker.check(password) and verify_password_in_memory(pdf_data, password)
+            else:
+                hit = verify_password_in_memory(pdf_data, password)
+
+            if hit:
+                elapsed_time = time.time() - start_time
+                speed = (tried_count + 1) / elapsed_time
+                print(f"\n✅ 找到密码：{password}")
+                print(f"📊 性能：{speed:.2f} 密码/秒 (耗时：{elapsed_time:.2f}秒)")
+                print(f"📈 尝试了 {tried_count + 1} 个密码")
+                return password
+
+            tried_count += 1
+
+            # 最多每秒输出一次进度（按时间而非次数，避免高速时频繁刷屏）
+            current_time = time.time()
+            if current_time - last_progress_time >= 1.0:
+                elapsed_time = current_time - start_time
+                speed = tried_count / elapsed_time if elapsed_time > 0 else 0
+                progress_pct = (tried_count / len(sorted_passwords) * 100) if len(sorted_passwords) > 0 else 0
+                print(f"⏳ 进度: {tried_count}/{len(sorted_passwords)} ({progress_pct:.1f}%), 速度: {speed:.2f} 密码/秒", end='\r')
+                last_progress_time = current_time
         
         # 如果循环正常结束（没找到密码）
         elapsed_time = time.time() - start_time
@@ -360,102 +1075,146 @@ def crack_pdf_password(input_file, dictionary_folder):
         # 抛出异常，让上层函数知道是用户中断
         raise KeyboardInterrupt("用户中断破解过程")
 
-def remove_pdf_password_optimized(input_file, output_file, dictionary_folder, password=None, num_processes=8, batch_size=50):
+# 历史命中记录文件（hashcat potfile 风格，每行"PDF标识:密码"）
+POT_FILE = os.path.join(os.path.expanduser('~'), '.pdf_password_pot')
+
+
+def pdf_pot_id(checker):
     """
-    高性能PDF密码移除（优化版）
-    
+    由加密字典内容（文档ID + /O + /U）生成PDF的稳定标识，
+    文件重命名或复制后仍能命中历史记录
+    """
+    hasher = hashlib.sha256(checker.document_id or b'')
+    hasher.update(checker.odata or b'')
+    hasher.update(checker.udata or b'')
+    return hasher.hexdigest()
+
+
+def lookup_pot_password(pot_id):
+    """
+    在 pot 文件中查找此前破解成功的密码，没有记录时返回 None
+    """
+    try:
+        with open(POT_FILE, 'r', encoding='utf-8') as f:
+            for line in f:
+                record_id, sep, password = line.rstrip('\n').partition(':')
+                if sep and record_id == pot_id:
+                    return password
+    except OSError:
+        pass
+    return None
+
+
+def record_pot_password(pot_id, password):
+    """
+    把破解成功的密码追加到 pot 文件，同一PDF下次直接复用
+    """
+    if lookup_pot_password(pot_id) == password:
+        return
+    try:
+        with open(POT_FILE, 'a', encoding='utf-8') as f:
+            f.write(f"{pot_id}:{password}\n")
+    except OSError:
+        pass
+
+
+def remove_pdf_password(input_file, output_file, dictionary_folder, password=None, num_processes=None, batch_size=None, use_optimized=True, frequency_file=None):
+    """
+    PDF密码移除（支持优化版本和标准版本）
+
+    解密顺序：提供的密码 → 空密码 → 内置常见密码 → 字典破解。
+    use_optimized 为 True 时字典破解使用多进程优化版本，
+    否则使用单线程标准版本。
+
     参数:
         input_file: 输入PDF文件路径
         output_file: 输出PDF文件路径
         dictionary_folder: 密码字典文件夹路径
         password: 已知密码（可选）
-        num_processes: 进程数
-        batch_size: 批次大小
+        num_processes: 进程数（默认取可用CPU核数，仅优化版本有效）
+        batch_size: 批次大小（默认按字典规模自适应，仅优化版本有效）
+        use_optimized: 是否使用多进程优化版本
+        frequency_file: 词频文件路径（可选），提供时按使用频率排序
     """
+    checker = PdfPasswordChecker.from_file(input_file)
+    offline = checker is not None and checker.supported
+    pot_id = pdf_pot_id(checker) if checker is not None else None
+
     # 首先尝试使用传入的密码
     if password:
         try:
             with pikepdf.open(input_file, password=password) as pdf:
                 pdf.save(output_file)
                 print(f"✅ 使用提供的密码解密成功")
+                if pot_id:
+                    record_pot_password(pot_id, password)
                 return
         except (pikepdf.PasswordError, pikepdf.PdfError):
             print("❌ 提供的密码不正确，开始字典破解...")
-    
-    # 尝试空密码
-    try:
-        with pikepdf.open(input_file, password='') as pdf:
+
+    # 历史命中记录：之前破解成功过的PDF直接复用密码，跳过整个破解流程
+    if pot_id:
+        pot_password = lookup_pot_password(pot_id)
+        if pot_password is not None:
+            try:
+                with pikepdf.open(input_file, password=pot_password) as pdf:
+                    pdf.save(output_file)
+                print(f"✅ 使用历史记录中的密码解密成功：{pot_password}")
+                return
+            except (pikepdf.PasswordError, pikepdf.PdfError):
+                pass
+
+    # 尝试空密码（离线校验可判定时先廉价排除，免去一次完整的打开尝试）
+    if not offline or checker.check(''):
+        try:
+            with pikepdf.open(input_file, password='') as pdf:
+                pdf.save(output_file)
+                print(f"✅ 使用空密码解密成功")
+                return
+        except (pikepdf.PasswordError, pikepdf.PdfError):
+            pass
+
+    # 快速路径：先试内置常见密码，命中就不用碰字典了
+    common_password = try_common_passwords(input_file, checker)
+    if common_password:
+        with pikepdf.open(input_file, password=common_password) as pdf:
             pdf.save(output_file)
-            print(f"✅ 使用空密码解密成功")
-            return
-    except (pikepdf.PasswordError, pikepdf.PdfError):
-        pass
-    
-    # 使用优化版破解
+        print(f"✅ 使用常见密码解密成功：{common_password}")
+        if pot_id:
+            record_pot_password(pot_id, common_password)
+        return
+
+    # 快速路径试过的密码无需再进字典破解
+    already_tried = set(iter_fast_candidates(include_pins=offline))
+
+    # 字典破解
     try:
-        found_password = crack_pdf_password_optimized(input_file, dictionary_folder, num_processes, batch_size)
+        if use_optimized:
+            found_password = crack_pdf_password_optimized(input_file, dictionary_folder,
+                                                          num_processes, batch_size,
+                                                          exclude=already_tried,
+                                                          frequency_file=frequency_file)
+        else:
+            found_password = crack_pdf_password(input_file, dictionary_folder,
+                                                exclude=already_tried,
+                                                frequency_file=frequency_file)
     except KeyboardInterrupt:
-        # 如果是在破解过程中被中断，crack_pdf_password_optimized 已经显示了性能数据
+        # 如果是在破解过程中被中断，破解函数已经显示了性能数据
         # 这里直接退出，不抛出异常
         return
-    
+
     if found_password:
         try:
             with pikepdf.open(input_file, password=found_password) as pdf:
                 pdf.save(output_file)
             print(f"✅ 使用找到的密码解密成功：{output_file}")
+            if pot_id:
+                record_pot_password(pot_id, found_password)
         except Exception as e:
             print(f"❌ 使用找到的密码解密失败: {e}")
             raise
     else:
-        # crack_pdf_password_optimized 已经打印了"未找到有效密码"和性能数据
-        # 这里直接返回，不抛出异常，避免显示 Traceback
-        return
-
-
-def remove_pdf_password(input_file, output_file, dictionary_folder, password=None, num_processes=8, batch_size=50, use_optimized=True):
-    """
-    PDF密码移除（支持优化版本和标准版本）
-    """
-    # 如果启用优化版本，使用优化版本
-    if use_optimized:
-        return remove_pdf_password_optimized(input_file, output_file, dictionary_folder, password, num_processes, batch_size)
-    
-    # 否则使用标准版本
-    # 首先尝试使用传入的密码
-    if password:
-        try:
-            with pikepdf.open(input_file, password=password) as pdf:
-                pdf.save(output_file)
-                print(f"✅ 使用提供的密码解密成功")
-                return
-        except (pikepdf.PasswordError, pikepdf.PdfError):
-            print("❌ 提供的密码不正确")
-    
-    # 尝试空密码
-    try:
-        with pikepdf.open(input_file, password='') as pdf:
-            pdf.save(output_file)
-            print(f"✅ 使用空密码解密成功")
-            return
-    except (pikepdf.PasswordError, pikepdf.PdfError):
-        print("❌ 空密码解密失败")
-    
-    # 使用标准破解
-    try:
-        found_password = crack_pdf_password(input_file, dictionary_folder)
-    except KeyboardInterrupt:
-        # 如果是在破解过程中被中断，crack_pdf_password 已经显示了性能数据
-        # 这里直接退出，不抛出异常
-        return
-    
-    if found_password:
-        with pikepdf.open(input_file, password=found_password) as pdf:
-            pdf.save(output_file)
-        print(f"✅ 使用找到的密码解密成功")
-        print(f"✅ 解密成功：{output_file}")
-    else:
-        # crack_pdf_password 已经打印了"未找到有效密码"和性能数据
+        # 破解函数已经打印了"未找到有效密码"和性能数据
         # 这里直接返回，不抛出异常，避免显示 Traceback
         return
 
@@ -490,20 +1249,35 @@ class SecurityRevision:
 def extract_pdf_hash(pdf_file):
     """
     提取PDF文件的hash值（John the Ripper / Hashcat 格式）
-    
+
     参数:
         pdf_file: PDF文件路径
-        
+
     返回:
         tuple: (hash字符串, 加密信息字典) 或 None
         hash字符串格式为 $pdf$...
         加密信息字典包含: algorithm, revision, length, hashcat_mode
+
+    提取结果按 路径+修改时间+大小 缓存，同一文件只解析一次
     """
     if not PYHANKO_AVAILABLE:
         print("❌ pyhanko 库不可用，无法提取 hash")
         print("   安装命令: pip install pyhanko")
         return None
-    
+
+    try:
+        stat = os.stat(pdf_file)
+    except OSError as e:
+        print(f"❌ 读取PDF文件失败: {e}")
+        return None
+    return _extract_pdf_hash_cached(pdf_file, stat.st_mtime_ns, stat.st_size)
+
+
+@lru_cache(maxsize=16)
+def _extract_pdf_hash_cached(pdf_file, mtime_ns, size):
+    """
+    实际的 hash 提取，mtime_ns/size 仅用于缓存键（文件变化时失效）
+    """
     try:
         with open(pdf_file, "rb") as doc:
             pdf = PdfFileReader(doc, strict=False)
@@ -817,8 +1591,9 @@ if __name__ == '__main__':
     parser.add_argument('-o', '--output', help='输出文件路径（encrypt/decrypt/hash时必需）')
     parser.add_argument('-p', '--password', help='密码')
     parser.add_argument('-d', '--dictionary', default='./password_brute_dictionary', help='密码字典文件夹路径')
-    parser.add_argument('-t', '--threads', type=int, default=8, help='进程数（默认8，仅优化版本有效）')
-    parser.add_argument('-b', '--batch-size', type=int, default=50, help='批次大小（默认50，仅优化版本有效）')
+    parser.add_argument('-t', '--threads', type=int, default=None, help='进程数（默认取可用CPU核数，仅优化版本有效）')
+    parser.add_argument('-b', '--batch-size', type=int, default=None, help='批次大小（默认按字典规模自适应，仅优化版本有效）')
+    parser.add_argument('-f', '--frequency', default=None, help='词频文件路径（每行"次数 密码"，按使用频率优先尝试）')
     parser.add_argument('--no-optimized', action='store_true', help='禁用优化版本，使用标准版本')
     
     args = parser.parse_args()
@@ -841,29 +1616,33 @@ if __name__ == '__main__':
         use_optimized = not args.no_optimized
         
         if use_optimized:
-            print(f"🚀 使用优化版本（{args.threads}进程，批次大小{args.batch_size}）")
+            threads_desc = args.threads if args.threads else f"自动（{available_cpu_count()}核）"
+            batch_desc = args.batch_size if args.batch_size else "自适应"
+            print(f"🚀 使用优化版本（{threads_desc}进程，批次大小{batch_desc}）")
         else:
             print("📝 使用标准版本")
-        remove_pdf_password(args.input, args.output, args.dictionary, args.password, 
-                          args.threads, args.batch_size, use_optimized)
+        remove_pdf_password(args.input, args.output, args.dictionary, args.password,
+                          args.threads, args.batch_size, use_optimized, args.frequency)
     
     elif args.action == 'hash':
-        if not args.output:
-            print("❌ hash操作需要指定输出文件路径 (-o)")
-            exit(1)
-        print(f"🔍 提取PDF hash值：{args.input}")
         result = extract_pdf_hash(args.input)
         if result:
             pdf_hash, encrypt_info = result
             hashcat_mode = encrypt_info['hashcat_mode']
             pdf_version = encrypt_info['pdf_version']
-            
-            # 保存hash到文件
-            try:
-                with open(args.output, 'w') as f:
-                    f.write(pdf_hash + '\n')
-                print(f"✅ Hash已保存到文件：{args.output}")
-                print_hashcat_usage(args.output, hashcat_mode, pdf_version)
-                print_john_usage(args.output, pdf_version)
-            except Exception as e:
-                print(f"❌ 保存hash到文件失败: {e}")
\ No newline at end of file
+
+            if args.output:
+                print(f"🔍 提取PDF hash值：{args.input}")
+                # 保存hash到文件
+                try:
+                    with open(args.output, 'w') as f:
+                        f.write(pdf_hash + '\n')
+                    print(f"✅ Hash已保存到文件：{args.output}")
+                    print_hashcat_usage(args.output, hashcat_mode, pdf_version)
+                    print_john_usage(args.output, pdf_version)
+                except Exception as e:
+                    print(f"❌ 保存hash到文件失败: {e}")
+            else:
+                # 不指定 -o 时直接输出到 stdout，便于管道交给 hashcat/john
+                print(pdf_hash)
+                print(f"# {pdf_version}，Hashcat模式：-m {hashcat_mode}", file=sys.stderr)
\ No newline at end of file